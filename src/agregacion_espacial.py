@@ -0,0 +1,205 @@
+# Agregados espaciales de las obras para los mapas de calor.
+# Las ubicaciones se agrupan en una grilla fija sobre la Ciudad y por
+# comuna/barrio; los totales se guardan en la tabla agregados_espaciales y
+# solo se recalculan las áreas donde hay obras nuevas o modificadas.
+
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from peewee import JOIN, chunked
+from modelo_orm import (
+    db, Obra, Ubicacion, Barrio, Comuna, AgregadoEspacial, ObraAgregada
+)
+
+# Grilla fija sobre CABA, celdas de 0.005° (~500 m)
+LAT_MIN, LAT_MAX = -34.71, -34.52
+LONG_MIN, LONG_MAX = -58.54, -58.33
+TAM_CELDA = 0.005
+FILAS = int(np.ceil((LAT_MAX - LAT_MIN) / TAM_CELDA))
+COLUMNAS = int(np.ceil((LONG_MAX - LONG_MIN) / TAM_CELDA))
+
+# Nivel de agregación → columna de ObraAgregada con la clave del área
+NIVELES = {"grilla": "celda", "comuna": "comuna", "barrio": "barrio"}
+
+# Columnas que, si cambian, cambian los agregados de la obra
+COLUMNAS_AGREGADAS = [*NIVELES.values(), "monto_contrato", "porcentaje_avance", "lat", "long"]
+
+# Obras por sentencia en los IN (...) e insert_many, para no pasar el límite
+# de variables de SQLite (32766) con cargas grandes. Las listas de áreas no se
+# parten: están acotadas por el tamaño de la grilla y la cantidad de barrios.
+TAM_LOTE = 500
+
+
+def asignar_celdas(lat, long) -> pd.Series:
+    lat = np.asarray(lat, dtype=float)
+    long = np.asarray(long, dtype=float)
+
+    with np.errstate(invalid="ignore"):
+        fila = np.floor((lat - LAT_MIN) / TAM_CELDA)
+        columna = np.floor((long - LONG_MIN) / TAM_CELDA)
+        dentro = (fila >= 0) & (fila < FILAS) & (columna >= 0) & (columna < COLUMNAS)
+
+    fila = pd.Series(np.where(dentro, fila, 0).astype(int)).astype(str)
+    columna = pd.Series(np.where(dentro, columna, 0).astype(int)).astype(str)
+    return (fila + ":" + columna).where(dentro, None)
+
+
+def limites_celda(clave):
+    fila, columna = (int(valor) for valor in clave.split(":"))
+    lat = LAT_MIN + fila * TAM_CELDA
+    long = LONG_MIN + columna * TAM_CELDA
+    return [[lat, long], [lat + TAM_CELDA, long + TAM_CELDA]]
+
+
+def agregar(claves, obras: pd.DataFrame) -> pd.DataFrame:
+    codigos, unicas = pd.factorize(pd.Series(claves).to_numpy())
+    validos = codigos >= 0
+    codigos = codigos[validos]
+    obras = obras[validos]
+    n = len(unicas)
+
+    monto = obras["monto_contrato"].to_numpy(dtype=float)
+    avance = obras["porcentaje_avance"].to_numpy(dtype=float)
+    lat = obras["lat"].to_numpy(dtype=float)
+    long = obras["long"].to_numpy(dtype=float)
+
+    cantidad = np.bincount(codigos, minlength=n)
+    monto_total = np.bincount(codigos, weights=np.nan_to_num(monto), minlength=n)
+
+    con_avance = ~np.isnan(avance)
+    suma_avance = np.bincount(codigos[con_avance], weights=avance[con_avance], minlength=n)
+    cantidad_avance = np.bincount(codigos[con_avance], minlength=n)
+
+    con_coordenadas = ~(np.isnan(lat) | np.isnan(long))
+    suma_lat = np.bincount(codigos[con_coordenadas], weights=lat[con_coordenadas], minlength=n)
+    suma_long = np.bincount(codigos[con_coordenadas], weights=long[con_coordenadas], minlength=n)
+    cantidad_coordenadas = np.bincount(codigos[con_coordenadas], minlength=n)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "clave": unicas,
+            "cantidad": cantidad,
+            "monto_total": monto_total,
+            "avance_promedio": np.where(cantidad_avance > 0, suma_avance / cantidad_avance, np.nan),
+            "lat": np.where(cantidad_coordenadas > 0, suma_lat / cantidad_coordenadas, np.nan),
+            "long": np.where(cantidad_coordenadas > 0, suma_long / cantidad_coordenadas, np.nan),
+        })
+
+
+def posiciones_obras(condicion) -> pd.DataFrame:
+    consulta = (
+        Obra
+        .select(Obra.id_obra, Obra.monto_contrato, Obra.porcentaje_avance,
+                Ubicacion.lat, Ubicacion.long, Barrio.barrio, Comuna.comuna)
+        .join(Ubicacion, JOIN.LEFT_OUTER, on=(Obra.id_ubicacion == Ubicacion.id_ubicacion))
+        .switch(Obra)
+        .join(Barrio, JOIN.LEFT_OUTER, on=(Obra.id_barrio == Barrio.id_barrio))
+        .join(Comuna, JOIN.LEFT_OUTER, on=(Barrio.id_comuna == Comuna.id_comuna))
+        .where(condicion)
+    )
+    columnas = ["id_obra", "monto_contrato", "porcentaje_avance", "lat", "long", "barrio", "comuna"]
+    obras = pd.DataFrame(list(consulta.dicts()), columns=columnas)
+    for col in ["monto_contrato", "porcentaje_avance", "lat", "long"]:
+        obras[col] = pd.to_numeric(obras[col], errors="coerce")
+    obras["celda"] = asignar_celdas(obras["lat"], obras["long"])
+    return obras
+
+
+def obras_pendientes(obras: pd.DataFrame) -> pd.DataFrame:
+    # Obras nunca agregadas o cuyo monto, avance, ubicación o barrio cambió
+    # desde el último cálculo (cualquier cambio, no solo los del historial)
+    guardadas = pd.DataFrame(
+        list(ObraAgregada.select(ObraAgregada.id_obra, *[getattr(ObraAgregada, c) for c in COLUMNAS_AGREGADAS]).dicts()),
+        columns=["id_obra", *COLUMNAS_AGREGADAS]
+    ).set_index("id_obra")
+    actuales = obras.set_index("id_obra")[COLUMNAS_AGREGADAS]
+
+    previas = guardadas.reindex(actuales.index)
+    iguales = (actuales == previas) | (actuales.isna() & previas.isna())
+    nuevas = ~actuales.index.isin(guardadas.index)
+    return obras[nuevas | ~iguales.all(axis=1).to_numpy()]
+
+
+def actualizar_agregados(ids_obras=None):
+    with db.atomic():
+        if ids_obras is None:
+            obras = obras_pendientes(posiciones_obras(Obra.id_obra.is_null(False)))
+        else:
+            ids_obras = list(ids_obras)
+            if not ids_obras:
+                return 0
+            obras = pd.concat(
+                [posiciones_obras(Obra.id_obra.in_(lote)) for lote in chunked(ids_obras, TAM_LOTE)],
+                ignore_index=True
+            )
+        if obras.empty:
+            return 0
+
+        anteriores = pd.DataFrame(
+            [
+                fila
+                for lote in chunked(obras["id_obra"].tolist(), TAM_LOTE)
+                for fila in ObraAgregada.select().where(ObraAgregada.id_obra.in_(lote)).dicts()
+            ],
+            columns=["id_obra", *NIVELES.values()]
+        )
+
+        # Áreas afectadas: donde estaban y donde están ahora las obras
+        tocadas = {
+            nivel: set(obras[columna].dropna()) | set(anteriores[columna].dropna())
+            for nivel, columna in NIVELES.items()
+        }
+
+        ahora = datetime.now()
+        filas = obras[["id_obra", *COLUMNAS_AGREGADAS]].astype(object)
+        filas = filas.where(filas.notna(), None)
+        registros = [{**fila, "actualizado": ahora} for fila in filas.to_dict("records")]
+        for lote in chunked(registros, TAM_LOTE):
+            ObraAgregada.insert_many(lote).on_conflict_replace().execute()
+
+        recalcular_areas(tocadas)
+
+    return len(obras)
+
+
+def recalcular_areas(tocadas):
+    condicion = None
+    for nivel, columna in NIVELES.items():
+        if tocadas[nivel]:
+            filtro = getattr(ObraAgregada, columna).in_(list(tocadas[nivel]))
+            condicion = filtro if condicion is None else condicion | filtro
+    if condicion is None:
+        return
+
+    ids = ObraAgregada.select(ObraAgregada.id_obra).where(condicion)
+    obras = posiciones_obras(Obra.id_obra.in_(ids))
+
+    for nivel, columna in NIVELES.items():
+        if not tocadas[nivel]:
+            continue
+        en_areas = obras[obras[columna].isin(tocadas[nivel])]
+        agregados = agregar(en_areas[columna], en_areas)
+        agregados.insert(0, "nivel", nivel)
+
+        AgregadoEspacial.delete().where(
+            (AgregadoEspacial.nivel == nivel) &
+            AgregadoEspacial.clave.in_(list(tocadas[nivel]))
+        ).execute()
+        if not agregados.empty:
+            filas = agregados.astype(object).where(agregados.notna(), None)
+            for lote in chunked(filas.to_dict("records"), TAM_LOTE):
+                AgregadoEspacial.insert_many(lote).execute()
+
+
+def recalcular_agregados():
+    with db.atomic():
+        AgregadoEspacial.delete().execute()
+        ObraAgregada.delete().execute()
+        return actualizar_agregados()
+
+
+def leer_agregados(nivel) -> pd.DataFrame:
+    if not AgregadoEspacial.table_exists():
+        return pd.DataFrame()
+    consulta = AgregadoEspacial.select().where(AgregadoEspacial.nivel == nivel)
+    return pd.DataFrame(list(consulta.dicts()))
@@ -0,0 +1,116 @@
+# Análisis del historial de cambios de las obras (tabla obra_eventos).
+# Todas las funciones trabajan sobre DataFrames con operaciones vectorizadas
+# de pandas/NumPy, sin recorrer fila por fila.
+
+import numpy as np
+import pandas as pd
+from modelo_orm import Obra, ObraEvento, CAMPOS_EVENTO
+
+COLUMNAS_EVENTOS = ["id_obra", "timestamp", "campo", "valor_anterior", "valor_nuevo"]
+
+
+def cargar_eventos() -> pd.DataFrame:
+    consulta = (
+        ObraEvento
+        .select(ObraEvento.id_obra, ObraEvento.timestamp, ObraEvento.campo,
+                ObraEvento.valor_anterior, ObraEvento.valor_nuevo)
+        .order_by(ObraEvento.id_obra, ObraEvento.timestamp, ObraEvento.id_evento)
+    )
+    eventos = pd.DataFrame(list(consulta.dicts()), columns=COLUMNAS_EVENTOS)
+    eventos["timestamp"] = pd.to_datetime(eventos["timestamp"])
+    return eventos
+
+
+def cargar_obras() -> pd.DataFrame:
+    consulta = Obra.select(
+        Obra.id_obra, Obra.nombre, Obra.fecha_inicio, Obra.fecha_fin_inicial,
+        *[Obra._meta.fields[campo] for campo in CAMPOS_EVENTO]
+    )
+    columnas = ["id_obra", "nombre", "fecha_inicio", "fecha_fin_inicial", *CAMPOS_EVENTO]
+    obras = pd.DataFrame(list(consulta.dicts()), columns=columnas)
+    obras["fecha_inicio"] = pd.to_datetime(obras["fecha_inicio"])
+    obras["fecha_fin_inicial"] = pd.to_datetime(obras["fecha_fin_inicial"])
+    return obras
+
+
+def detectar_demoras(eventos: pd.DataFrame, obras: pd.DataFrame) -> pd.DataFrame:
+    # Cada cambio de plazo_meses: positivo si fue un incremento
+    plazos = eventos[eventos["campo"] == "plazo_meses"]
+    delta = (plazos["valor_nuevo"] - plazos["valor_anterior"]).to_numpy(dtype=float)
+
+    demoras = pd.DataFrame({
+        "id_obra": plazos["id_obra"].to_numpy(),
+        "incrementos": delta > 0,
+        "meses_agregados": np.clip(np.nan_to_num(delta), 0, None),
+    }).groupby("id_obra").sum()
+    # Primer cambio de cada obra (los eventos vienen ordenados); no se usa
+    # first() porque saltea los NaN y el plazo original puede ser NULL
+    demoras["plazo_original"] = plazos.drop_duplicates("id_obra").set_index("id_obra")["valor_anterior"]
+
+    demoras = demoras.join(obras.set_index("id_obra")[["nombre", "fecha_fin_inicial"]])
+
+    # fecha_fin_inicial corrida en los meses agregados (aritmética de meses en
+    # NumPy). El día se limita al largo del mes destino: 31/01 + 1 mes = 29/02.
+    fin_inicial = demoras["fecha_fin_inicial"].to_numpy(dtype="datetime64[D]")
+    mes_inicial = fin_inicial.astype("datetime64[M]")
+    dia_del_mes = fin_inicial - mes_inicial.astype("datetime64[D]")
+    meses = demoras["meses_agregados"].to_numpy(dtype=int).astype("timedelta64[M]")
+    mes_destino = mes_inicial + meses
+    ultimo_dia = (mes_destino + 1).astype("datetime64[D]") - mes_destino.astype("datetime64[D]") - 1
+    fin_actual = mes_destino.astype("datetime64[D]") + np.minimum(dia_del_mes, ultimo_dia)
+
+    demoras["fecha_fin_actual"] = fin_actual
+    demoras["dias_demora"] = (fin_actual - fin_inicial).astype("timedelta64[D]").astype(float)
+    demoras["incrementos"] = demoras["incrementos"].astype(int)
+
+    return demoras[demoras["incrementos"] > 0].sort_values("dias_demora", ascending=False)
+
+
+def tasa_avance(eventos: pd.DataFrame) -> pd.DataFrame:
+    avances = eventos[eventos["campo"] == "porcentaje_avance"]
+    agrupado = avances.groupby("id_obra")
+    primeros = avances.drop_duplicates("id_obra", keep="first").set_index("id_obra")
+    ultimos = avances.drop_duplicates("id_obra", keep="last").set_index("id_obra")
+
+    tasas = pd.DataFrame({
+        "avance_inicial": primeros["valor_anterior"],
+        "avance_actual": ultimos["valor_nuevo"],
+        "primer_registro": agrupado["timestamp"].min(),
+        "ultimo_registro": agrupado["timestamp"].max(),
+        "actualizaciones": agrupado.size(),
+    })
+
+    # Puntos de avance por día entre el primer y el último registro
+    dias = (tasas["ultimo_registro"] - tasas["primer_registro"]).dt.total_seconds().to_numpy() / 86400
+    puntos = (tasas["avance_actual"] - tasas["avance_inicial"].fillna(0)).to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tasa = np.where(dias > 0, puntos / dias, np.nan)
+        restantes = np.where(tasa > 0, (100 - tasas["avance_actual"].to_numpy(dtype=float)) / tasa, np.nan)
+
+    tasas["puntos_por_dia"] = tasa
+    tasas["dias_restantes_estimados"] = restantes
+    return tasas
+
+
+def estado_a_fecha(obras: pd.DataFrame, eventos: pd.DataFrame, fecha) -> pd.DataFrame:
+    # El valor de un campo a una fecha es el valor_anterior del primer cambio
+    # posterior a esa fecha; si no hubo cambios posteriores, es el valor actual.
+    # Las obras dadas de alta después de la fecha no se incluyen (las cargadas
+    # antes de que existiera el evento "alta" se consideran siempre existentes).
+    fecha = pd.Timestamp(fecha)
+    estado = obras.set_index("id_obra").copy()
+
+    posteriores = eventos[eventos["timestamp"] > fecha]
+    altas_posteriores = posteriores.loc[posteriores["campo"] == "alta", "id_obra"]
+    estado = estado.drop(index=altas_posteriores, errors="ignore")
+
+    cambios_posteriores = posteriores[
+        posteriores["campo"].isin(CAMPOS_EVENTO) & posteriores["id_obra"].isin(estado.index)
+    ]
+    # Primera fila de cada (obra, campo), con su valor_anterior aunque sea NULL
+    primeros = cambios_posteriores.drop_duplicates(["id_obra", "campo"], keep="first")
+
+    for campo, cambios in primeros.groupby("campo"):
+        estado.loc[cambios["id_obra"].to_numpy(), campo] = cambios["valor_anterior"].to_numpy()
+
+    return estado
@@ -0,0 +1,55 @@
+# Benchmark de la ingesta concurrente de varios CSV.
+# Genera copias del CSV del observatorio, las carga en una base nueva con
+# distinta cantidad de procesos y muestra filas/s y la ocupación del hilo
+# escritor. Cuando el escritor se acerca al 100% de ocupación, agregar
+# procesos ya no mejora el rendimiento.
+#
+# Uso (desde la raíz del proyecto):
+#   python src/benchmark_ingesta.py [cantidad_de_archivos]
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from gestionar_obra import GestionarObra
+from ingesta_concurrente import cargar_archivos
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    nucleos = os.cpu_count() or 1
+    pruebas = sorted({1, 2, 4, 8, nucleos} & set(range(1, nucleos + 1)) | {nucleos})
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        rutas = []
+        for i in range(cantidad):
+            ruta = os.path.join(carpeta, f"obras_{i}.csv")
+            shutil.copy(GestionarObra.CSV_PATH, ruta)
+            rutas.append(ruta)
+
+        # Referencia: un archivo por el camino secuencial (cargar_datos, fila por fila)
+        GestionarObra.DB_PATH = os.path.join(carpeta, "obras_secuencial.db")
+        GestionarObra.mapear_orm(GestionarObra.conectar_db())
+        inicio = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            GestionarObra.cargar_datos(GestionarObra.limpiar_datos(GestionarObra.extraer_datos()))
+        segundos = time.perf_counter() - inicio
+        filas = len(GestionarObra.limpiar_datos(GestionarObra.extraer_datos()))
+        print(f"Secuencial (cargar_datos, 1 archivo): {filas / segundos:.0f} filas/s\n")
+
+        print(f"{cantidad} archivos, {nucleos} núcleos")
+        print(f"{'procesos':>9}{'filas':>9}{'segundos':>10}{'filas/s':>10}{'escritor':>10}")
+        for procesos in pruebas:
+            GestionarObra.DB_PATH = os.path.join(carpeta, f"obras_{procesos}.db")
+            with contextlib.redirect_stdout(io.StringIO()):
+                resultado = cargar_archivos(rutas, procesos=procesos)
+            ocupacion = resultado["tiempo_escritura"] / resultado["segundos"]
+            print(f"{procesos:>9}{resultado['filas']:>9}{resultado['segundos']:>10.2f}"
+                  f"{resultado['filas'] / resultado['segundos']:>10.0f}{ocupacion:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
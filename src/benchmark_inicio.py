@@ -0,0 +1,85 @@
+# Benchmark de arranque en frío de los subcomandos livianos del CLI.
+# Ejecuta cada subcomando en un proceso nuevo con `python -X importtime`,
+# suma el tiempo de importación de los módulos de primer nivel y mide el
+# tiempo total del proceso. También muestra si se llegó a importar pandas.
+#
+# Uso (desde la raíz del proyecto):
+#   python src/benchmark_inicio.py [repeticiones]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+CARPETA = os.path.dirname(os.path.abspath(__file__))
+CLI = os.path.join(CARPETA, "cli.py")
+
+
+def preparar_db(ruta):
+    # Base mínima con una obra para poder correr las operaciones del ciclo de vida
+    sys.path.insert(0, CARPETA)
+    from gestionar_obra import GestionarObra
+    from modelo_orm import Obra, Etapa
+
+    GestionarObra.DB_PATH = ruta
+    db = GestionarObra.conectar_db()
+    GestionarObra.mapear_orm(db)
+    db.connect()
+    Etapa.create(etapa="Finalizada")
+    Etapa.create(etapa="Rescisión")
+    Obra.create(nombre="Obra de prueba", plazo_meses=12, porcentaje_avance=0, mano_obra=10)
+    db.close()
+
+
+def medir(argumentos):
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", CLI, *argumentos],
+        capture_output=True, text=True
+    )
+    total = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr)
+
+    # Líneas "import time: self [us] | cumulative | nombre"; las de primer
+    # nivel no tienen sangría en el nombre
+    importacion = 0
+    modulos = set()
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea.split("|")
+        modulos.add(nombre.strip())
+        if not nombre.startswith("  "):
+            importacion += int(acumulado)
+
+    return total, importacion / 1e6, "pandas" in modulos
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta_db = os.path.join(carpeta, "obras.db")
+        preparar_db(ruta_db)
+
+        subcomandos = [
+            ["indicadores"],
+            ["avance", "1", "50"],
+            ["plazo", "1", "18"],
+            ["mano-obra", "1", "20"],
+            ["finalizar", "1"],
+        ]
+
+        print(f"{'subcomando':<15}{'proceso (s)':>13}{'imports (s)':>13}  pandas")
+        for argumentos in subcomandos:
+            medidas = [medir(["--db", ruta_db, *argumentos]) for _ in range(repeticiones)]
+            total = min(m[0] for m in medidas)
+            importacion = min(m[1] for m in medidas)
+            con_pandas = any(m[2] for m in medidas)
+            print(f"{argumentos[0]:<15}{total:>13.3f}{importacion:>13.3f}  {'sí' if con_pandas else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
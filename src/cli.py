@@ -0,0 +1,134 @@
+# Punto de entrada de línea de comandos con subcomandos.
+# Solo se importan al inicio argparse y los modelos (peewee); pandas, NumPy y
+# folium se importan dentro de los subcomandos que los necesitan, y la base de
+# datos se abre recién al ejecutar el subcomando.
+#
+# Ejemplos (desde la raíz del proyecto):
+#   python src/cli.py migrar
+#   python src/cli.py importar
+#   python src/cli.py importar-archivos data/obras_2022.csv data/obras_2023.csv
+#   python src/cli.py indicadores
+#   python src/cli.py avance 12 60
+#   python src/cli.py finalizar 12
+#   python src/cli.py mapa --salida mapa_obras.html
+
+import argparse
+import sys
+from peewee import OperationalError
+from gestionar_obra import GestionarObra
+
+
+def migrar(args):
+    GestionarObra.mapear_orm(GestionarObra.conectar_db())
+    print(f"✅ Base {GestionarObra.DB_PATH} actualizada")
+
+
+def importar(args):
+    GestionarObra.mapear_orm(GestionarObra.conectar_db())
+    df = GestionarObra.extraer_datos()
+    df_limpio = GestionarObra.limpiar_datos(df)
+    GestionarObra.cargar_datos(df_limpio)
+
+
+def importar_archivos(args):
+    from ingesta_concurrente import cargar_archivos
+    cargar_archivos(args.archivos, procesos=args.procesos, tam_lote=args.lote)
+
+
+def indicadores(args):
+    GestionarObra.obtener_indicadores()
+
+
+def mapa(args):
+    from mapa_obras import generar_mapa
+    generar_mapa(GestionarObra.CSV_PATH, args.salida)
+    print(f"Mapa guardado en {args.salida}")
+
+
+def nueva_obra(args):
+    GestionarObra.nueva_obra()
+
+
+def ciclo_de_vida(metodo, *campos):
+    # Arma un subcomando que busca la obra por id y llama al método indicado
+    def ejecutar(args):
+        from modelo_orm import Obra, ConflictoVersion
+
+        db = GestionarObra.conectar_db()
+        db.connect()
+        try:
+            obra = Obra.get_or_none(Obra.id_obra == args.id_obra)
+            if obra is None:
+                print(f"No existe la obra con ID {args.id_obra}")
+                return 1
+            getattr(obra, metodo)(*[getattr(args, campo) for campo in campos])
+        except ConflictoVersion as e:
+            print(f"⚠️ {e}. Vuelva a intentarlo.")
+            return 1
+        finally:
+            db.close()
+
+    return ejecutar
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="obras", description="Gestión de obras urbanas")
+    parser.add_argument("--db", default=GestionarObra.DB_PATH, help="Archivo SQLite a usar")
+    parser.add_argument("--csv", default=GestionarObra.CSV_PATH, help="CSV del observatorio de obras")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    sub.add_parser("migrar", help="Crear o actualizar las tablas sin cargar datos").set_defaults(func=migrar)
+    sub.add_parser("importar", help="Crear las tablas y cargar el CSV").set_defaults(func=importar)
+    p = sub.add_parser("importar-archivos", help="Cargar varios CSV en paralelo con un único escritor")
+    p.add_argument("archivos", nargs="+")
+    p.add_argument("--procesos", type=int, default=None, help="Procesos para leer y limpiar (por defecto, uno por núcleo)")
+    p.add_argument("--lote", type=int, default=500, help="Filas por transacción")
+    p.set_defaults(func=importar_archivos)
+
+    sub.add_parser("indicadores", help="Mostrar los indicadores de las obras").set_defaults(func=indicadores)
+    sub.add_parser("nueva-obra", help="Cargar una obra nueva de forma interactiva").set_defaults(func=nueva_obra)
+
+    p = sub.add_parser("mapa", help="Generar el mapa HTML de las obras")
+    p.add_argument("--salida", default="mapa_obras.html")
+    p.set_defaults(func=mapa)
+
+    # Operaciones del ciclo de vida: (subcomando, método de Obra, argumentos)
+    operaciones = [
+        ("nuevo-proyecto", "nuevo_proyecto", [("tipo_intervencion", str), ("area_responsable", str), ("barrio", str)]),
+        ("contratacion", "iniciar_contratacion", [("tipo_contratacion", str), ("nro_contratacion", str)]),
+        ("adjudicar", "adjudicar_obra", [("empresa", str)]),
+        ("iniciar", "iniciar_obra", [("destacada", lambda v: v.lower() in ["s", "si", "true", "1"]),
+                                     ("fecha_inicio", str), ("fecha_fin_inicial", str),
+                                     ("financiamiento", str), ("mano_obra", int)]),
+        ("avance", "actualizar_porcentaje_avance", [("porcentaje", int)]),
+        ("plazo", "incrementar_plazo", [("plazo_meses", int)]),
+        ("mano-obra", "incrementar_mano_obra", [("mano_obra", int)]),
+        ("finalizar", "finalizar_obra", []),
+        ("rescindir", "rescindir_obra", []),
+    ]
+    for nombre, metodo, argumentos in operaciones:
+        p = sub.add_parser(nombre, help=f"Obra.{metodo}")
+        p.add_argument("id_obra", type=int)
+        for campo, tipo in argumentos:
+            p.add_argument(campo, type=tipo)
+        p.set_defaults(func=ciclo_de_vida(metodo, *[campo for campo, _ in argumentos]))
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    GestionarObra.DB_PATH = args.db
+    GestionarObra.CSV_PATH = args.csv
+    try:
+        return args.func(args)
+    except OperationalError as e:
+        # Base creada con una versión anterior (faltan tablas o columnas)
+        if "no such" not in str(e):
+            raise
+        print(f"⚠️ La base {args.db} no está actualizada ({e}). Ejecute: python src/cli.py migrar")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
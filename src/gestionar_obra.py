@@ -1,12 +1,20 @@
-import pandas as pd
+# pandas y los agregados espaciales se importan dentro de los métodos que los
+# usan, para que las operaciones simples (indicadores, ciclo de vida de una
+# obra) no paguen el costo de importarlos.
+from __future__ import annotations
 from abc import ABC, abstractmethod
-from peewee import SqliteDatabase
+from typing import TYPE_CHECKING
 from modelo_orm import (
-    BaseModel, Obra, Entorno, Etapa, TipoIntervencion, AreaResponsable,
-    Comuna, Barrio, Empresa, Contratacion, Financiamiento, Ubicacion
+    db, Obra, Entorno, Etapa, TipoIntervencion, AreaResponsable,
+    Comuna, Barrio, Empresa, Contratacion, Financiamiento, Ubicacion,
+    ObraEvento, AgregadoEspacial, ObraAgregada, crear_triggers_eventos
 )
 from datetime import datetime
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from peewee import SqliteDatabase
+
 class GestionarObra(ABC):
     DB_PATH = "obras_urbanas2.db"
     CSV_PATH = "data/observatorio-de-obras-urbanas.csv"
@@ -15,12 +23,13 @@ class GestionarObra(ABC):
 
     @classmethod
     def extraer_datos(cls) -> pd.DataFrame:
+        import pandas as pd
         return pd.read_csv(cls.CSV_PATH, sep=cls.SEP, encoding=cls.ENCODING)
 
     @classmethod
     def conectar_db(cls) -> SqliteDatabase:
-        db = SqliteDatabase(cls.DB_PATH)
-        BaseModel._meta.database = db
+        if db.database != cls.DB_PATH:
+            db.init(cls.DB_PATH)
         return db
 
     @classmethod
@@ -30,13 +39,32 @@ class GestionarObra(ABC):
         modelos = [
             Entorno, Etapa, TipoIntervencion, AreaResponsable,
             Comuna, Barrio, Empresa, Contratacion, Financiamiento,
-            Obra, Ubicacion
+            Obra, Ubicacion, ObraEvento, AgregadoEspacial, ObraAgregada
         ]
+        # obras_agregadas es un caché: si le faltan columnas de una versión
+        # anterior se recrea y los agregados se recalculan desde cero
+        if ObraAgregada.table_exists():
+            columnas = [c.name for c in db.get_columns(ObraAgregada._meta.table_name)]
+            if "monto_contrato" not in columnas:
+                db.drop_tables([ObraAgregada])
+                if AgregadoEspacial.table_exists():
+                    AgregadoEspacial.delete().execute()
+
         db.create_tables(modelos)
+
+        # Bases creadas antes del control de concurrencia no tienen "version".
+        # La migración recrea la tabla obras, así que va antes de los triggers.
+        columnas = [c.name for c in db.get_columns(Obra._meta.table_name)]
+        if "version" not in columnas:
+            from playhouse.migrate import SqliteMigrator, migrate
+            migrate(SqliteMigrator(db).add_column(Obra._meta.table_name, "version", Obra.version))
+
+        crear_triggers_eventos(db)
         db.close()
 
     @classmethod
     def limpiar_datos(cls, df: pd.DataFrame) -> pd.DataFrame:
+        import pandas as pd
 
             # 1. Eliminar columnas innecesarias y normalizar nombres de columnas
         cols_a_eliminar = [c for c in df.columns if c.startswith("Unnamed")]
@@ -67,12 +95,35 @@ class GestionarObra(ABC):
             )
             df["monto_contrato"] = pd.to_numeric(df["monto_contrato"], errors="coerce")
 
+        # → Coordenadas: vienen con coma decimal, separadores de miles o sin
+        #   separador ("-34,567", "-34.567.123", "-34567123"). Todas son de CABA
+        #   (-34,… / -58,…), así que se toman los dígitos y se pone la coma
+        #   decimal después de los dos primeros.
+        if "lat" in df.columns and "lng" in df.columns:
+            for col in ["lat", "lng"]:
+                digitos = (
+                    df[col]
+                    .astype(str)
+                    .str.split("\n").str[0]
+                    .str.replace(r"\D", "", regex=True)
+                )
+                df[col] = -pd.to_numeric(digitos.str[:2] + "." + digitos.str[2:], errors="coerce")
+
+            # Filas con latitud y longitud invertidas
+            invertidas = df["lat"] < df["lng"]
+            df.loc[invertidas, ["lat", "lng"]] = df.loc[invertidas, ["lng", "lat"]].to_numpy()
+
         # 4. Conversión y completado de valores numéricos
         df["plazo_meses"] = pd.to_numeric(df["plazo_meses"], errors="coerce")
         df["plazo_meses"] = df["plazo_meses"].fillna(round(df["plazo_meses"].mean()))
 
         df["mano_obra"] = pd.to_numeric(df["mano_obra"], errors="coerce").fillna(0)
 
+        df["porcentaje_avance"] = pd.to_numeric(
+            df["porcentaje_avance"].astype(str).str.replace("%", "", regex=False).str.replace(",", ".", regex=False),
+            errors="coerce"
+        )
+
         # 5. Reemplazo de nulos por valores por defecto (texto)
         texto_por_defecto = {
             "expediente-numero": "Sin especificar",
@@ -113,6 +164,9 @@ class GestionarObra(ABC):
 
     @classmethod
     def cargar_datos(cls, df: pd.DataFrame):
+        import pandas as pd
+        from agregacion_espacial import actualizar_agregados
+
         db = cls.conectar_db()
         db.connect()
 
@@ -123,7 +177,10 @@ class GestionarObra(ABC):
                 tipo_int_obj, _ = TipoIntervencion.get_or_create(tipo=row['tipo'])
                 area_obj, _ = AreaResponsable.get_or_create(area_nombre=row['area_responsable'])
                 comuna_obj, _ = Comuna.get_or_create(comuna=row['comuna'])
-                barrio_obj, _ = Barrio.get_or_create(barrio=row['barrio'])
+                barrio_obj, _ = Barrio.get_or_create(
+                    barrio=row['barrio'],
+                    defaults={'id_comuna': comuna_obj}
+                )
                 ubicacion_obj, _ = Ubicacion.get_or_create(
                     direccion=row.get('direccion'),
                     lat=row.get('lat'),
@@ -164,6 +221,7 @@ class GestionarObra(ABC):
             except Exception as e:
                 print(f"Error fila {idx}: {e}")
 
+        actualizar_agregados()
         db.close()
         print("🏁 Proceso de carga finalizado")
 
@@ -226,6 +284,8 @@ class GestionarObra(ABC):
             id_financiamiento=financiamiento
         )
 
+        from agregacion_espacial import actualizar_agregados
+        actualizar_agregados([obra.id_obra])
         db.close()
         print(f"✅ Obra creada con ID: {obra.id_obra}")
         return obra
@@ -0,0 +1,236 @@
+# Ingesta de varios CSV en paralelo.
+# Cada archivo se lee y limpia en un proceso del pool (extraer + limpiar_datos)
+# y las filas pasan por una cola acotada a un único hilo escritor, que las
+# inserta en SQLite en lotes, cada uno en su propia transacción. SQLite admite
+# un solo escritor, así que todas las escrituras (incluidas las altas de
+# tablas de dimensión) las hace ese hilo, que además mantiene el caché de ids.
+# Si falla un lote de un archivo, los lotes anteriores ya quedaron confirmados
+# y el resto del archivo se descarta; el resumen indica hasta qué fila se cargó.
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from gestionar_obra import GestionarObra
+from modelo_orm import (
+    db, Obra, Entorno, Etapa, TipoIntervencion, AreaResponsable,
+    Comuna, Barrio, Empresa, Contratacion, Financiamiento, Ubicacion
+)
+
+# (campo FK en Obra, modelo, {campo del modelo: columna del CSV}).
+# Comuna va antes que Barrio porque el barrio se crea asociado a su comuna.
+DIMENSIONES = [
+    ("id_entorno", Entorno, {"entorno": "entorno"}),
+    ("id_etapa", Etapa, {"etapa": "etapa"}),
+    ("id_tipo_intervencion", TipoIntervencion, {"tipo": "tipo"}),
+    ("id_area_responsable", AreaResponsable, {"area_nombre": "area_responsable"}),
+    (None, Comuna, {"comuna": "comuna"}),
+    ("id_barrio", Barrio, {"barrio": "barrio"}),
+    ("id_ubicacion", Ubicacion, {"direccion": "direccion", "lat": "lat", "long": "lng"}),
+    ("id_empresa", Empresa, {"nombre": "licitacion_oferta_empresa", "cuit": "cuit_contratista"}),
+    ("id_contratacion", Contratacion, {"tipo": "contratacion_tipo"}),
+    ("id_financiamiento", Financiamiento, {"fuente": "financiamiento"}),
+]
+
+# Campo de Obra → columna del CSV
+CAMPOS_OBRA = {
+    "nombre": "nombre",
+    "descripcion": "descripcion",
+    "monto_contrato": "monto_contrato",
+    "plazo_meses": "plazo_meses",
+    "fecha_inicio": "fecha_inicio",
+    "fecha_fin_inicial": "fecha_fin_inicial",
+    "porcentaje_avance": "porcentaje_avance",
+    "mano_obra": "mano_obra",
+    "nro_expediente": "expediente-numero",
+    "nro_contratacion": "nro_contratacion",
+    "esDestacada": "destacada",
+}
+
+
+def procesar_archivo(ruta):
+    # Se ejecuta en un proceso del pool: devuelve filas como dicts de Python
+    # listos para insertar, así el escritor no hace trabajo de pandas.
+    import pandas as pd
+
+    df = pd.read_csv(ruta, sep=GestionarObra.SEP, encoding=GestionarObra.ENCODING)
+    df = GestionarObra.limpiar_datos(df)
+
+    columnas = set(CAMPOS_OBRA.values())
+    for _, _, campos in DIMENSIONES:
+        columnas.update(campos.values())
+    for col in columnas - set(df.columns):
+        df[col] = None
+
+    # Las columnas de dimensión obligatorias en el modelo no pueden quedar vacías
+    for _, modelo, campos in DIMENSIONES:
+        for campo, col in campos.items():
+            if not modelo._meta.fields[campo].null:
+                df[col] = df[col].fillna("Sin especificar")
+
+    df["fecha_inicio"] = df["fecha_inicio"].dt.date
+    df["fecha_fin_inicial"] = df["fecha_fin_inicial"].dt.date
+    df["cuit_contratista"] = df["cuit_contratista"].astype(str).where(df["cuit_contratista"].notna(), "")
+
+    df = df[sorted(columnas)].astype(object)
+    return df.where(df.notna(), None).to_dict("records")
+
+
+class EscritorObras(threading.Thread):
+    def __init__(self, cola, resumen):
+        super().__init__(name="escritor-obras")
+        self.cola = cola
+        self.resumen = resumen
+        self.ids = {}                 # modelo → {clave: id}
+        self.tiempo_escritura = 0.0
+
+    def cargar_cache(self):
+        for _, modelo, campos in DIMENSIONES:
+            consulta = modelo.select(modelo._meta.primary_key, *[getattr(modelo, c) for c in campos])
+            self.ids[modelo] = {tuple(fila[1:]): fila[0] for fila in consulta.tuples()}
+
+    def resolver(self, fila, nuevos):
+        ids_obra = {}
+        for campo_obra, modelo, campos in DIMENSIONES:
+            clave = tuple(fila[col] for col in campos.values())
+            if clave not in self.ids[modelo]:
+                extra = {}
+                if modelo is Barrio:
+                    extra["id_comuna"] = self.ids[Comuna][(fila["comuna"],)]
+                creado = modelo.create(**dict(zip(campos, clave)), **extra)
+                self.ids[modelo][clave] = creado._pk
+                nuevos.append((modelo, clave))
+            if campo_obra:
+                ids_obra[campo_obra] = self.ids[modelo][clave]
+        return ids_obra
+
+    def escribir_lote(self, ruta, filas):
+        if self.resumen[ruta]["fallido"]:
+            self.resumen[ruta]["omitidas"] += len(filas)
+            return
+
+        inicio = time.perf_counter()
+        nuevos = []
+        try:
+            with db.atomic():
+                obras = [
+                    {**{campo: fila[col] for campo, col in CAMPOS_OBRA.items()}, **self.resolver(fila, nuevos)}
+                    for fila in filas
+                ]
+                Obra.insert_many(obras).execute()
+            self.resumen[ruta]["cargadas"] += len(filas)
+        except Exception as e:
+            # La transacción se deshizo: descartar los ids creados en este lote
+            for modelo, clave in nuevos:
+                self.ids[modelo].pop(clave, None)
+            cargadas = self.resumen[ruta]["cargadas"]
+            self.resumen[ruta]["fallido"] = True
+            self.resumen[ruta]["omitidas"] += len(filas)
+            self.resumen[ruta]["errores"].append(
+                f"escritura de las filas {cargadas + 1}-{cargadas + len(filas)}: {e}"
+            )
+        self.tiempo_escritura += time.perf_counter() - inicio
+
+    def run(self):
+        try:
+            db.connect(reuse_if_open=True)
+            self.cargar_cache()
+            error = None
+        except Exception as e:
+            error = e
+
+        # Aunque no se pueda escribir, la cola se sigue vaciando para no
+        # bloquear al hilo principal
+        while True:
+            item = self.cola.get()
+            if item is None:
+                break
+            if error is None:
+                self.escribir_lote(*item)
+            else:
+                ruta, filas = item
+                if not self.resumen[ruta]["fallido"]:
+                    self.resumen[ruta]["errores"].append(f"escritura: {error}")
+                self.resumen[ruta]["fallido"] = True
+                self.resumen[ruta]["omitidas"] += len(filas)
+
+        db.close()
+
+
+def cargar_archivos(rutas, procesos=None, tam_lote=500, max_cola=8):
+    procesos = procesos or os.cpu_count() or 1
+    inicio = time.perf_counter()
+
+    GestionarObra.mapear_orm(GestionarObra.conectar_db())
+
+    resumen = {
+        ruta: {"leidas": 0, "cargadas": 0, "omitidas": 0, "fallido": False, "errores": []}
+        for ruta in rutas
+    }
+    cola = queue.Queue(maxsize=max_cola)   # Cola acotada: si el escritor se atrasa, put() bloquea
+    escritor = EscritorObras(cola, resumen)
+
+    # Los procesos se crean con "spawn": hacer fork de un proceso que ya tiene
+    # el hilo escritor y su conexión SQLite abiertos no es seguro
+    pool = ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context("spawn"))
+    escritor.start()
+
+    try:
+        with pool:
+            pendientes = iter(rutas)
+            en_curso = {}
+
+            def enviar():
+                ruta = next(pendientes, None)
+                if ruta is not None:
+                    en_curso[pool.submit(procesar_archivo, ruta)] = ruta
+
+            # Como mucho dos archivos por proceso en vuelo
+            for _ in range(2 * procesos):
+                enviar()
+
+            while en_curso:
+                listos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in listos:
+                    ruta = en_curso.pop(futuro)
+                    try:
+                        filas = futuro.result()
+                    except Exception as e:
+                        resumen[ruta]["errores"].append(f"lectura: {e}")
+                    else:
+                        resumen[ruta]["leidas"] += len(filas)
+                        for i in range(0, len(filas), tam_lote):
+                            cola.put((ruta, filas[i:i + tam_lote]))
+                    enviar()
+    finally:
+        cola.put(None)
+        escritor.join()
+
+    from agregacion_espacial import actualizar_agregados
+    db.connect(reuse_if_open=True)
+    actualizar_agregados()
+    db.close()
+
+    segundos = time.perf_counter() - inicio
+    cargadas = sum(r["cargadas"] for r in resumen.values())
+
+    print("\nResumen de la carga:")
+    for ruta, r in resumen.items():
+        estado = "✅" if not r["errores"] else "⚠️"
+        print(f"{estado} {ruta}: {r['cargadas']}/{r['leidas']} filas")
+        if r["fallido"] and r["cargadas"]:
+            print(f"    - Carga parcial: las filas 1-{r['cargadas']} quedaron guardadas y "
+                  f"{r['omitidas']} no se cargaron; volver a cargar el archivo duplicaría esas filas")
+        for error in r["errores"]:
+            print(f"    - {error}")
+    print(f"🏁 {cargadas} filas en {segundos:.2f} s ({cargadas / segundos:.0f} filas/s, "
+          f"escritor ocupado {escritor.tiempo_escritura / segundos:.0%})")
+
+    return {
+        "archivos": resumen,
+        "filas": cargadas,
+        "segundos": segundos,
+        "tiempo_escritura": escritor.tiempo_escritura,
+    }
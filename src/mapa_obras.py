@@ -1,59 +1,116 @@
 # Importar las librerías necesarias
 import pandas as pd            # Para manipular datos (como leer CSVs)
 import folium                  # Para crear mapas interactivos con marcadores
+from folium.plugins import HeatMap
+from branca.colormap import LinearColormap
+from modelo_orm import ObraAgregada
+from gestionar_obra import GestionarObra
+from agregacion_espacial import actualizar_agregados, leer_agregados, limites_celda
 
 # Instalar la librería folium con:
 # pip install folium
 
-# Leer el archivo CSV que contiene información de obras urbanas
-df = pd.read_csv("data/observatorio-de-obras-urbanas.csv",
-                 encoding="latin1", sep=";")  # Se especifica el encoding y el separador ";"
 
-# --- LIMPIEZA DE COORDENADAS ---
+def generar_mapa(ruta_csv=GestionarObra.CSV_PATH, ruta_html="mapa_obras.html"):
+    # Leer el archivo CSV que contiene información de obras urbanas
+    df = pd.read_csv(ruta_csv, encoding=GestionarObra.ENCODING, sep=GestionarObra.SEP)
 
-# Asegurar que los valores de latitud estén limpios: 
-# a veces vienen con saltos de línea, nos quedamos con la primera parte
-df['lat'] = df['lat'].astype(str).str.split('\n').str[0]
+    # --- LIMPIEZA DE COORDENADAS ---
 
-# Eliminar puntos usados como separadores de miles (ej: "1.234" → "1234")
-df['lng'] = df['lng'].astype(str).str.replace('.', '', regex=False)
-df['lat'] = df['lat'].str.replace('.', '', regex=False)
+    # Se usa la misma limpieza que al cargar la base, así los marcadores
+    # coinciden con las celdas y áreas de los agregados
+    df = GestionarObra.limpiar_datos(df)
 
-# Reemplazar las comas por puntos (pasa cuando los datos vienen con formato europeo)
-df['lat'] = df['lat'].str.replace(',', '.', regex=False)
-df['lng'] = df['lng'].str.replace(',', '.', regex=False)
+    # Eliminar las filas que no tienen coordenadas válidas
+    df = df.dropna(subset=['lat', 'lng'])
 
-# Convertir los valores de lat y lng a tipo numérico (float), forzando errores a NaN
-df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
-df['lng'] = pd.to_numeric(df['lng'], errors='coerce')
+    # --- CREACIÓN DEL MAPA ---
 
-# Eliminar las filas que no tienen coordenadas válidas
-df = df.dropna(subset=['lat', 'lng'])
+    # Crear un mapa centrado en Buenos Aires con un zoom inicial de 12
+    mapa = folium.Map(location=[-34.60, -58.44], zoom_start=12)
 
-# --- CREACIÓN DEL MAPA ---
+    # Recorrer cada fila del DataFrame para crear un marcador por obra
+    for _, fila in df.iterrows():
+        lat = fila['lat']
+        lon = fila['lng']
+        nombre = fila['nombre']
 
-# Crear un mapa centrado en Buenos Aires con un zoom inicial de 12
-mapa = folium.Map(location=[-34.60, -58.44], zoom_start=12)
+        # Armar un popup (ventana emergente) con info de la obra
+        popup_html = (
+            f"<b>{nombre}</b><br>"
+            f"Lat: {lat:.6f}<br>"
+            f"Lng: {lon:.6f}"
+        )
 
-# Recorrer cada fila del DataFrame para crear un marcador por obra
-for _, fila in df.iterrows():
-    lat = fila['lat']
-    lon = fila['lng']
-    nombre = fila['nombre']
+        # Agregar un marcador al mapa con ubicación, popup y tooltip (texto flotante)
+        folium.Marker(
+            location=[lat, lon],
+            popup=popup_html,
+            tooltip=f"{nombre} ({lat:.4f}, {lon:.4f})"
+        ).add_to(mapa)
 
-    # Armar un popup (ventana emergente) con info de la obra
-    popup_html = (
-        f"<b>{nombre}</b><br>"
-        f"Lat: {lat:.6f}<br>"
-        f"Lng: {lon:.6f}"
-    )
+    # --- CAPAS DE AGREGADOS (grilla, comuna y barrio) ---
 
-    # Agregar un marcador al mapa con ubicación, popup y tooltip (texto flotante)
-    folium.Marker(
-        location=[lat, lon],
-        popup=popup_html,
-        tooltip=f"{nombre} ({lat:.4f}, {lon:.4f})"
-    ).add_to(mapa)
+    # Recalcular solo las áreas con obras nuevas o modificadas y leer los totales
+    GestionarObra.conectar_db()
+    if ObraAgregada.table_exists():
+        actualizar_agregados()
+    grilla = leer_agregados("grilla")
 
-# Guardar el mapa generado como archivo HTML para verlo en un navegador
-mapa.save("mapa_obras.html")
+    if not grilla.empty:
+        # Mapa de calor de densidad de obras (centro de cada celda ponderado por cantidad)
+        HeatMap(
+            grilla[["lat", "long", "cantidad"]].dropna().values.tolist(),
+            name="Densidad de obras",
+            radius=25
+        ).add_to(mapa)
+
+        # Coroplético de inversión: cada celda coloreada según el monto total
+        escala = LinearColormap(["#ffffb2", "#fd8d3c", "#bd0026"],
+                                vmin=grilla["monto_total"].min(),
+                                vmax=grilla["monto_total"].max(),
+                                caption="Monto total de contratos por celda")
+        capa_inversion = folium.FeatureGroup(name="Inversión por celda", show=False)
+        for celda in grilla.itertuples():
+            folium.Rectangle(
+                bounds=limites_celda(celda.clave),
+                color=None,
+                fill=True,
+                fill_color=escala(celda.monto_total),
+                fill_opacity=0.6,
+                tooltip=f"{celda.cantidad} obras - ${celda.monto_total:,.2f}"
+            ).add_to(capa_inversion)
+        capa_inversion.add_to(mapa)
+        escala.add_to(mapa)
+
+    # Totales por comuna y barrio, ubicados en el centro de sus obras
+    for nivel in ["comuna", "barrio"]:
+        areas = leer_agregados(nivel)
+        if areas.empty:
+            continue
+
+        capa = folium.FeatureGroup(name=f"Totales por {nivel}", show=False)
+        maximo = areas["cantidad"].max()
+        for area in areas.dropna(subset=["lat", "long"]).itertuples():
+            avance = "-" if pd.isna(area.avance_promedio) else f"{area.avance_promedio:.1f}%"
+            folium.CircleMarker(
+                location=[area.lat, area.long],
+                radius=5 + 20 * area.cantidad / maximo,
+                fill=True,
+                popup=(
+                    f"<b>{nivel.title()} {area.clave}</b><br>"
+                    f"Obras: {area.cantidad}<br>"
+                    f"Monto total: ${area.monto_total:,.2f}<br>"
+                    f"Avance promedio: {avance}"
+                )
+            ).add_to(capa)
+        capa.add_to(mapa)
+
+    folium.LayerControl().add_to(mapa)
+
+    # Guardar el mapa generado como archivo HTML para verlo en un navegador
+    mapa.save(ruta_html)
+
+
+if __name__ == "__main__":
+    generar_mapa()
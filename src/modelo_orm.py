@@ -2,19 +2,24 @@
 from peewee import *
 import random
 from datetime import datetime
-import pandas as pd
 #import geopandas as gpd
 #import matplotlib.pyplot as plt
 #import contextily as ctx
 
-# Definimos la base de datos SQLite que se usará
-db = SqliteDatabase("obras_urbanas2.db")
+# Base de datos SQLite con inicialización diferida: la ruta se indica con
+# db.init(ruta) al conectarse (ver GestionarObra.conectar_db), así importar
+# los modelos no abre ni crea ningún archivo.
+db = SqliteDatabase(None)
 
 # Clase base de la que heredarán todos los modelos, asigna la base de datos
 class BaseModel(Model):
     class Meta:
         database = db
 
+# Se lanza cuando se guarda una obra que otro proceso modificó desde que se leyó
+class ConflictoVersion(Exception):
+    pass
+
 # Tabla de entornos (urbano, natural, etc.)
 class Entorno(BaseModel):
     id_entorno = AutoField()  # Clave primaria autoincremental
@@ -154,6 +159,67 @@ class Obra(BaseModel):
     id_empresa = ForeignKeyField(Empresa, null=True, backref="obras")
     id_barrio = ForeignKeyField(Barrio, null = True, backref="obras")
     id_financiamiento = ForeignKeyField(Financiamiento, null=True, backref="obras")
+    version = IntegerField(default=0)   # Control de concurrencia optimista
+
+    # Guarda con compare-and-swap: UPDATE ... WHERE id_obra=? AND version=?.
+    # Si otro proceso guardó la obra después de leerla, no se pisa nada y se
+    # lanza ConflictoVersion; hay que volver a leer la obra y reintentar.
+    def save(self, force_insert=False, only=None):
+        if force_insert or self.id_obra is None:
+            return super().save(force_insert=force_insert, only=only)
+
+        if only:
+            campos = [self._meta.combined[c] if isinstance(c, str) else c for c in only]
+        else:
+            # Como en peewee, solo los campos cargados en la instancia: los que
+            # no se seleccionaron no se pisan con NULL
+            campos = [
+                f for f in self._meta.sorted_fields
+                if f.name in self.__data__ and f.name not in ("id_obra", "version")
+            ]
+        valores = {campo: self.__data__.get(campo.name) for campo in campos}
+        valores[Obra.version] = Obra.version + 1
+
+        filas = (
+            Obra.update(valores)
+            .where((Obra.id_obra == self.id_obra) & (Obra.version == self.version))
+            .execute()
+        )
+        if filas == 0:
+            raise ConflictoVersion(f"La obra {self.id_obra} fue modificada por otro proceso (versión {self.version})")
+
+        self.version += 1
+        self._dirty.clear()
+        return filas
+
+    # Actualización condicional atómica: la regla de negocio se evalúa en el
+    # mismo UPDATE, contra el valor actual en la base y no contra el de memoria.
+    # Devuelve False si la condición no se cumplió.
+    def _actualizar_si(self, condicion, **valores):
+        actualizacion = {getattr(Obra, campo): valor for campo, valor in valores.items()}
+        actualizacion[Obra.version] = Obra.version + 1
+
+        filas = list(
+            Obra.update(actualizacion)
+            .where((Obra.id_obra == self.id_obra) & condicion)
+            .returning(Obra.version)
+            .tuples()
+            .execute()
+        )
+        if not filas:
+            return False
+
+        # Solo se refrescan los campos actualizados; los demás cambios sin
+        # guardar de la instancia se conservan. La versión se adopta solo si
+        # nadie más modificó la obra desde que se leyó: si no, la instancia
+        # sigue desactualizada y el próximo save() da ConflictoVersion.
+        for campo, valor in valores.items():
+            self.__data__[campo] = valor
+            self._dirty.discard(campo)
+        if filas[0][0] == self.version + 1:
+            self.version = filas[0][0]
+            self._dirty.discard("version")
+        return True
 
     def nuevo_proyecto(self, tipoIntervencion, areaResponsable, barrio):
 
@@ -262,20 +328,23 @@ class Obra(BaseModel):
  
     def actualizar_porcentaje_avance(self, nuevoPorcentaje):
 
-        if self.porcentaje_avance > nuevoPorcentaje:
+        actualizada = self._actualizar_si(
+            Obra.porcentaje_avance.is_null() | (Obra.porcentaje_avance <= nuevoPorcentaje),
+            porcentaje_avance=nuevoPorcentaje
+        )
+        if not actualizada:
             print("El porcentaje de avance ingresado no puede ser menor al existente")
-        else:
-            self.porcentaje_avance = nuevoPorcentaje
  
     def incrementar_plazo(self, nuevoPlazo):
 
-        if self.plazo_meses > nuevoPlazo:
+        actualizada = self._actualizar_si(
+            Obra.plazo_meses.is_null() | (Obra.plazo_meses <= nuevoPlazo),
+            plazo_meses=nuevoPlazo
+        )
+        if not actualizada:
             print("El plazo no puede ser menor al existente")
         else:
-            self.plazo_meses = nuevoPlazo
-            print("Se actualizó la mano de obra")
-        
-        self.save()
+            print("Se actualizó el plazo")
          
     def incrementar_mano_obra(self, incrementoManoObra):
 
@@ -283,9 +352,8 @@ class Obra(BaseModel):
             print("La cantidad de mano de obra a agregar no puede ser 0 ni menor a 0")
         else:
             self.mano_obra = incrementoManoObra
+            self.save()
             print("Se actualizó la mano de obra")
-        
-        self.save()
  
     def finalizar_obra(self):
         etapa = Etapa.get(Etapa.etapa == "Finalizada")
@@ -308,3 +376,105 @@ class Obra(BaseModel):
         db_table = "obras"
 
 
+# Historial append-only de cambios de estado de las obras.
+# Las filas las escriben triggers de SQLite dentro del mismo UPDATE que hace
+# save(), así que registrar un evento no agrega consultas desde Python.
+class ObraEvento(BaseModel):
+    id_evento = AutoField()
+    id_obra = ForeignKeyField(Obra, backref="eventos")
+    timestamp = DateTimeField()
+    campo = CharField()                       # Campo de Obra que cambió, o "alta"
+    valor_anterior = IntegerField(null=True)
+    valor_nuevo = IntegerField(null=True)
+
+    def __str__(self):
+        return f"Evento {self.campo} de obra {self.id_obra_id}"
+
+    class Meta:
+        db_table = "obra_eventos"
+        indexes = (
+            (("id_obra", "timestamp"), False),
+        )
+
+
+# Campos de Obra que modifican los métodos del ciclo de vida
+CAMPOS_EVENTO = ("porcentaje_avance", "plazo_meses", "mano_obra", "id_etapa")
+
+def crear_triggers_eventos(database):
+    tabla_obras = Obra._meta.table_name
+    tabla_eventos = ObraEvento._meta.table_name
+
+    for campo in CAMPOS_EVENTO:
+        columna = Obra._meta.fields[campo].column_name
+        database.execute_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla_obras}_evento_{campo}
+            AFTER UPDATE OF {columna} ON {tabla_obras}
+            WHEN OLD.{columna} IS NOT NEW.{columna}
+            BEGIN
+                INSERT INTO {tabla_eventos}
+                    (id_obra_id, timestamp, campo, valor_anterior, valor_nuevo)
+                VALUES
+                    (NEW.id_obra, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'),
+                     '{campo}', OLD.{columna}, NEW.{columna});
+            END
+        """)
+
+    # Alta de cada obra, para reconstruir qué obras existían a una fecha
+    database.execute_sql(f"""
+        CREATE TRIGGER IF NOT EXISTS {tabla_obras}_evento_alta
+        AFTER INSERT ON {tabla_obras}
+        BEGIN
+            INSERT INTO {tabla_eventos} (id_obra_id, timestamp, campo)
+            VALUES (NEW.id_obra, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'), 'alta');
+        END
+    """)
+
+    # El historial no se puede modificar ni borrar
+    for operacion in ("UPDATE", "DELETE"):
+        database.execute_sql(f"""
+            CREATE TRIGGER IF NOT EXISTS {tabla_eventos}_no_{operacion.lower()}
+            BEFORE {operacion} ON {tabla_eventos}
+            BEGIN
+                SELECT RAISE(ABORT, 'El historial de obras es de solo agregado');
+            END
+        """)
+
+
+# Agregados espaciales precalculados (grilla fija, comuna y barrio) para los
+# mapas de calor. Una fila por celda/área con los totales ya calculados.
+class AgregadoEspacial(BaseModel):
+    id_agregado = AutoField()
+    nivel = CharField()                       # "grilla", "comuna" o "barrio"
+    clave = CharField()                       # Celda "fila:columna" o nombre del área
+    cantidad = IntegerField()
+    monto_total = FloatField()
+    avance_promedio = FloatField(null=True)
+    lat = FloatField(null=True)               # Centro de las obras del área
+    long = FloatField(null=True)
+
+    def __str__(self):
+        return f"Agregado {self.nivel} {self.clave}"
+
+    class Meta:
+        db_table = "agregados_espaciales"
+        indexes = (
+            (("nivel", "clave"), True),
+        )
+
+
+# Valores con los que se contó cada obra la última vez que se calcularon los
+# agregados (áreas, monto, avance y coordenadas). Comparándolos con la fila
+# actual se detectan las obras modificadas y se recalculan solo sus áreas.
+class ObraAgregada(BaseModel):
+    id_obra = ForeignKeyField(Obra, primary_key=True, backref="agregado")
+    celda = CharField(null=True)
+    comuna = CharField(null=True)
+    barrio = CharField(null=True)
+    monto_contrato = FloatField(null=True)
+    porcentaje_avance = FloatField(null=True)
+    lat = FloatField(null=True)
+    long = FloatField(null=True)
+    actualizado = DateTimeField()
+
+    class Meta:
+        db_table = "obras_agregadas"
@@ -0,0 +1,106 @@
+# Prueba de estrés del control de concurrencia optimista de Obra.
+# Varios procesos actualizan la misma obra a la vez:
+#   - mano_obra: leer, sumar 1 y guardar, reintentando ante ConflictoVersion.
+#     Al final tiene que valer exactamente procesos * iteraciones.
+#   - porcentaje_avance: valores al azar con actualizar_porcentaje_avance.
+#     Nunca puede bajar y al final tiene que ser el máximo intentado.
+# Para comparar, se corre lo mismo con el save() común de peewee, que pisa
+# los cambios de los otros procesos.
+#
+# Uso (desde la raíz del proyecto):
+#   python src/stress_concurrencia.py [procesos] [iteraciones]
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+from multiprocessing import Pool
+from peewee import Model
+from gestionar_obra import GestionarObra
+from modelo_orm import Obra, ObraEvento, ConflictoVersion
+
+
+def trabajador(ruta_db, iteraciones, con_control, semilla):
+    GestionarObra.DB_PATH = ruta_db
+    db = GestionarObra.conectar_db()
+    db.connect()
+    azar = random.Random(semilla)
+    conflictos = 0
+    maximo_avance = 0
+
+    for _ in range(iteraciones):
+        while True:
+            obra = Obra.get_by_id(1)
+            obra.mano_obra += 1
+            try:
+                if con_control:
+                    obra.save()
+                else:
+                    Model.save(obra)
+                break
+            except ConflictoVersion:
+                conflictos += 1
+
+        if con_control:
+            avance = azar.randint(0, 100)
+            maximo_avance = max(maximo_avance, avance)
+            with contextlib.redirect_stdout(io.StringIO()):
+                Obra.get_by_id(1).actualizar_porcentaje_avance(avance)
+
+    db.close()
+    return conflictos, maximo_avance
+
+
+def correr(carpeta, procesos, iteraciones, con_control):
+    ruta_db = os.path.join(carpeta, f"stress_{con_control}.db")
+    GestionarObra.DB_PATH = ruta_db
+    db = GestionarObra.conectar_db()
+    GestionarObra.mapear_orm(db)
+    db.connect()
+    Obra.create(nombre="Obra de prueba", mano_obra=0, porcentaje_avance=0, plazo_meses=12)
+    db.close()
+
+    with Pool(procesos) as pool:
+        resultados = pool.starmap(
+            trabajador,
+            [(ruta_db, iteraciones, con_control, semilla) for semilla in range(procesos)]
+        )
+
+    db.connect()
+    obra = Obra.get_by_id(1)
+    bajadas = ObraEvento.select().where(
+        (ObraEvento.campo == "porcentaje_avance") &
+        (ObraEvento.valor_nuevo < ObraEvento.valor_anterior)
+    ).count()
+    db.close()
+
+    esperado = procesos * iteraciones
+    conflictos = sum(r[0] for r in resultados)
+    maximo_avance = max(r[1] for r in resultados)
+
+    print(f"\n{'Con' if con_control else 'Sin'} control de versión:")
+    print(f"  mano_obra: {obra.mano_obra}/{esperado} "
+          f"({esperado - obra.mano_obra} actualizaciones perdidas, {conflictos} conflictos reintentados)")
+    if con_control:
+        print(f"  porcentaje_avance: {obra.porcentaje_avance} (máximo intentado {maximo_avance}), "
+              f"{bajadas} retrocesos en el historial")
+        return obra.mano_obra == esperado and obra.porcentaje_avance == maximo_avance and bajadas == 0
+    return True
+
+
+def main():
+    procesos = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    iteraciones = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        correr(carpeta, procesos, iteraciones, con_control=False)
+        correcto = correr(carpeta, procesos, iteraciones, con_control=True)
+
+    print("\n✅ Sin actualizaciones perdidas" if correcto else "\n❌ Se perdieron actualizaciones")
+    return 0 if correcto else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())